@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent geocode cache backed by SQLite
+基于SQLite的地理编码持久化缓存
+
+每个地点一行，查询和写入只涉及单行，进度检查点只提交有变化的行，
+不再每次重写整个 geo.json。geo.json 仍作为前端使用的导出文件，
+并且是提交到仓库中的数据：每次打开缓存时，如果 geo.json 在上次同步后
+被修改过（git pull、手动修正等），以 geo.json 的内容为准。
+"""
+
+import json
+import os
+import sqlite3
+from typing import Dict, Any, Optional
+
+CACHE_PATH = "data/geo.sqlite"
+GEO_JSON_PATH = "data/geo.json"
+
+# geo.json 中每个地点保留的字段
+GEO_FIELDS = ('province', 'city', 'district', 'location', 'level')
+
+
+def make_key(name: str, city: str = "广州") -> str:
+    """Normalize name and city into a cache key"""
+    return f"{city.strip()}|{''.join(name.split())}"
+
+
+class GeoCache:
+    """
+    Geocode cache stored in SQLite, keyed by normalized name + city
+    地理编码缓存，以规范化后的名称和城市作为主键
+    """
+
+    def __init__(self, path: str = CACHE_PATH, seed_path: str = GEO_JSON_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS geo ("
+            "key TEXT PRIMARY KEY, name TEXT NOT NULL, json TEXT NOT NULL, level TEXT)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        # 导出前必须先与 geo.json 对齐，否则会用旧缓存覆盖更新过的文件
+        if os.path.exists(seed_path):
+            self.sync_from_json(seed_path)
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM geo").fetchone()[0]
+
+    def get(self, name: str, city: str = "广州") -> Optional[Dict[str, Any]]:
+        """Return the cached geocode for a place, or None"""
+        row = self.conn.execute(
+            "SELECT json FROM geo WHERE key = ?", (make_key(name, city),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, name: str, data: Dict[str, Any], city: str = "广州") -> None:
+        """Insert or update a place, keeping only the fields exported to geo.json"""
+        if 'location' in data:
+            data = {field: data.get(field, '') for field in GEO_FIELDS}
+
+        # 使用 UPSERT 而不是 REPLACE，更新时保留原有行的顺序
+        self.conn.execute(
+            "INSERT INTO geo (key, name, json, level) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "name = excluded.name, json = excluded.json, level = excluded.level",
+            (make_key(name, city), name, json.dumps(data, ensure_ascii=False), data.get('level', ''))
+        )
+
+    def delete(self, name: str, city: str = "广州") -> None:
+        """Remove a place from the cache if present"""
+        self.conn.execute("DELETE FROM geo WHERE key = ?", (make_key(name, city),))
+
+    def commit(self) -> None:
+        """Flush pending writes to disk"""
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+    def sync_from_json(self, path: str) -> None:
+        """
+        Reconcile the cache with a geo.json file changed since the last sync
+
+        文件未变化时，缓存中只可能多出上次中断的运行新获取的坐标，予以保留；
+        文件变化时以文件为准：更新同名条目，并删除文件中已没有的条目。
+        """
+        if self._file_stamp(path) == self._get_meta(path):
+            return
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                geocodes = json.load(f)
+        except Exception as e:
+            print(f"Error loading {path}: {e}")
+            return
+
+        for name, data in geocodes.items():
+            self.put(name, data)
+
+        keys = {make_key(name) for name in geocodes}
+        stale = [key for (key,) in self.conn.execute("SELECT key FROM geo") if key not in keys]
+        self.conn.executemany("DELETE FROM geo WHERE key = ?", [(key,) for key in stale])
+
+        self.mark_synced(path)
+
+    def mark_synced(self, path: str) -> None:
+        """Record that the cache and a geo.json file now hold the same data"""
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (path, self._file_stamp(path))
+        )
+        self.commit()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _file_stamp(path: str) -> str:
+        stat = os.stat(path)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return all cached places as a {name: geocode} dict in insertion order"""
+        rows = self.conn.execute("SELECT name, json FROM geo ORDER BY rowid")
+        return {name: json.loads(data) for name, data in rows}
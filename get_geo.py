@@ -6,15 +6,27 @@ Intelligent geocoding script for kindergartens and home addresses
 
 API频率限制说明：
 - 高德地图API限制：最多3次/秒
-- 本脚本严格遵守：每次API调用后等待400毫秒
-- 实际频率：约2.5次/秒，确保不超过官方限制
+- 本脚本使用 RateController 在所有并发请求间共享限额：正常情况下按 1/3 秒的间隔发送，
+  遇到限流（HTTP 429、Retry-After 或 infocode=10021 等）时间隔加倍，之后逐步恢复
+- 多个请求并发发出，网络往返时间互相重叠，不再在每次调用后固定等待
 """
 
+import asyncio
 import json
-import requests
-import time
 import os
-from typing import Dict, List, Any, Optional
+import re
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+
+import aiohttp
+from aiolimiter import AsyncLimiter
+
+from cache import GeoCache, GEO_FIELDS, GEO_JSON_PATH
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 高德地图API配置
 API_KEY = os.getenv("AMAP_API_KEY", "")
@@ -22,6 +34,31 @@ if not API_KEY:
     raise ValueError("AMAP_API_KEY environment variable is required")
 GEOCODING_URL = "https://restapi.amap.com/v3/geocode/geo"
 
+# API频率控制：高德地图API最多3次/秒
+RATE_LIMIT = 3
+RATE_PERIOD = 1
+# 每次运行共享一个连接池，空闲连接保持 keep-alive 以复用 TCP/TLS 握手
+MAX_CONNECTIONS = 16
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+REQUEST_TIMEOUT = 10
+# 服务端临时错误、限流和网络错误的重试策略：等待 BACKOFF_FACTOR * 2^n 秒（最多 MAX_BACKOFF 秒）后重试
+MAX_RETRIES = 4
+BACKOFF_FACTOR = 1
+MAX_BACKOFF = 16
+RETRY_STATUSES = (429, 502, 503, 504)
+# 自适应频率控制（AIMD）：成功时频率增加 RATE_INCREASE_STEP 次/秒，每次限流事件频率乘以 RATE_DECREASE_FACTOR，
+# 请求间隔最长 MAX_INTERVAL 秒
+RATE_INCREASE_STEP = 0.1
+RATE_DECREASE_FACTOR = 0.5
+MAX_INTERVAL = 1.0
+# 高德API的QPS超限错误码
+THROTTLE_INFOCODES = ("10019", "10020", "10021")
+# 同时进行地理编码的幼儿园数量，与3次/秒的限额匹配
+MAX_WORKERS = 3
+# 每处理多少个幼儿园提交一次缓存
+SAVE_INTERVAL = 50
+
 # 家庭住址列表
 HOME_ADDRESSES = [
     "越秀·保利爱特城22栋",
@@ -29,14 +66,106 @@ HOME_ADDRESSES = [
 ]
 
 # 精确度级别要求：兴趣点级别表示位置比较精确
-PRECISE_LEVELS = ["兴趣点", "门牌号", "单元号", "楼层", "房间", "门址"]
+PRECISE_LEVELS = frozenset({"兴趣点", "门牌号", "单元号", "楼层", "房间", "门址"})
+
+# 一次运行中已发出的地理编码请求，按规范化后的 (地址, 城市) 去重；由 run_geocoding 为每次运行新建
+GeocodeTasks = Dict[Tuple[str, str], "asyncio.Task[Optional[Dict[str, Any]]]"]
+
+# 多班型幼儿园在 school.json 中被拆分为 "名称（xx班）"，这些条目对应同一个地点
+_BASE_NAME_RE = re.compile(r'^(.*)（[\u4e00-\u9fff]+班）$')
+
+# 地址开头的省份，比较地址前去掉
+_PROVINCE_PREFIX_RE = re.compile(r'^[\u4e00-\u9fff]{2,3}省')
+
+class RateController:
+    """
+    Adaptive request pacing for the Amap API (AIMD)
+    自适应频率控制：请求成功时逐步提高请求频率，遇到限流时频率减半并暂停发送
+    """
+    
+    def __init__(self, rate: int = RATE_LIMIT, period: float = RATE_PERIOD):
+        # AsyncLimiter 作为硬上限，保证任何情况下都不超过官方限额
+        self.limiter = AsyncLimiter(rate, period)
+        self.min_interval = period / rate
+        self.interval = self.min_interval
+        self.next_send_time = 0.0
+        # 上一次降低频率的时间；在此之前发出的请求被限流属于同一次限流事件
+        self.last_decrease_time = float('-inf')
+        self.request_count = 0
+        self.throttle_count = 0
+    
+    async def __aenter__(self) -> float:
+        """等待发送时机，返回请求的发送时间，供 record() 判断限流事件"""
+        loop = asyncio.get_running_loop()
+        # 等待到下一个允许发送的时间点；间隔可能在等待期间被调整，因此醒来后重新检查
+        while True:
+            now = loop.time()
+            if now >= self.next_send_time:
+                break
+            await asyncio.sleep(self.next_send_time - now)
+        self.next_send_time = now + self.interval
+        await self.limiter.acquire()
+        self.request_count += 1
+        return loop.time()
+    
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+    
+    def record(self, sent_at: float, status: int, headers: Any,
+               data: Optional[Dict[str, Any]] = None) -> None:
+        """根据响应状态码、响应头和返回的infocode调整请求间隔"""
+        retry_after = headers.get('Retry-After')
+        throttled = (
+            status == 429
+            or retry_after is not None
+            or headers.get('X-RateLimit-Remaining') == '0'
+            or (data or {}).get('infocode') in THROTTLE_INFOCODES
+        )
+        
+        if not throttled:
+            # 加性增：每次成功请求频率增加一点，直到回到官方限额
+            rate = min(1 / self.min_interval, 1 / self.interval + RATE_INCREASE_STEP)
+            self.interval = 1 / rate
+            return
+        
+        self.throttle_count += 1
+        loop = asyncio.get_running_loop()
+        
+        # 降频之前已经发出的请求被限流，属于同一次限流事件，不再重复降频
+        if sent_at < self.last_decrease_time:
+            return
+        
+        # 乘性减：请求频率减半，并按 Retry-After（如有）暂停发送
+        self.interval = min(self.interval / RATE_DECREASE_FACTOR, MAX_INTERVAL)
+        self.last_decrease_time = loop.time()
+        try:
+            pause = float(retry_after)
+        except (TypeError, ValueError):
+            pause = self.interval
+        self.next_send_time = max(self.next_send_time, loop.time() + pause)
+        print(f"    触发限流，请求间隔调整为 {self.interval:.2f} 秒")
+
+def normalize_address(address: str, city: str = "广州") -> str:
+    """
+    去掉空白并统一大小写，再去掉开头的省份和城市，用于判断两个地址是否相同
+    高德返回的 formatted_address 总是以 "广东省广州市" 开头，而 school.json 中的地址通常只写 "广州市"
+    """
+    address = _PROVINCE_PREFIX_RE.sub('', ''.join(address.split()).lower(), count=1)
+    for prefix in (city + "市", city):
+        if address.startswith(prefix):
+            return address[len(prefix):]
+    return address
+
+def base_name(name: str) -> str:
+    """去掉拆分班型时添加的（xx班）后缀；分园等其他括号内容保留"""
+    match = _BASE_NAME_RE.match(name)
+    return match.group(1) if match else name
 
 def load_existing_geocodes() -> Dict[str, Any]:
     """Load existing geocode data from geo.json"""
-    geo_file = "data/geo.json"
-    if os.path.exists(geo_file):
+    if os.path.exists(GEO_JSON_PATH):
         try:
-            with open(geo_file, 'r', encoding='utf-8') as f:
+            with open(GEO_JSON_PATH, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
             print(f"Error loading existing geo.json: {e}")
@@ -44,31 +173,38 @@ def load_existing_geocodes() -> Dict[str, Any]:
     return {}
 
 def save_geocodes(geocodes: Dict[str, Any]) -> None:
-    """Save geocode data to geo.json with only required fields"""
-    os.makedirs("data", exist_ok=True)
+    """Atomically save geocode data to geo.json with only required fields"""
+    os.makedirs(os.path.dirname(GEO_JSON_PATH) or ".", exist_ok=True)
     
-    # 只保留必要字段
+    # 只保留必要字段，与缓存保存的字段一致
     cleaned_geocodes = {}
     for key, data in geocodes.items():
         if isinstance(data, dict) and 'location' in data:
-            cleaned_geocodes[key] = {
-                'province': data.get('province', ''),
-                'city': data.get('city', ''),
-                'district': data.get('district', ''),
-                'location': data.get('location', ''),
-                'level': data.get('level', '')
-            }
+            cleaned_geocodes[key] = {field: data.get(field, '') for field in GEO_FIELDS}
         else:
             # 保持原有数据结构（如果已经是清理过的）
             cleaned_geocodes[key] = data
     
-    with open("data/geo.json", 'w', encoding='utf-8') as f:
-        json.dump(cleaned_geocodes, f, ensure_ascii=False, indent=2)
+    # orjson 直接输出UTF-8，结果与 json.dumps(ensure_ascii=False, indent=2) 相同但快得多
+    if orjson is not None:
+        payload = orjson.dumps(cleaned_geocodes, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(cleaned_geocodes, ensure_ascii=False, indent=2).encode('utf-8')
+    
+    # 先写入临时文件再整体替换，中断时不会留下写了一半的 geo.json
+    tmp_file = GEO_JSON_PATH + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, GEO_JSON_PATH)
 
-def get_geocode(address: str, city: str = "广州") -> Optional[Dict[str, Any]]:
+async def fetch(session: aiohttp.ClientSession, limiter: RateController,
+                address: str, city: str) -> Dict[str, Any]:
     """
-    Get geocoding information from Amap API
-    获取地址的地理编码信息
+    Send one geocoding request, paced by the shared limiter and retried with
+    exponential backoff on throttling, transient HTTP errors and network errors
+    发送一次地理编码请求，由共享的限流器控制频率；被限流或网络出错时退避重试
     """
     params = {
         'key': API_KEY,
@@ -76,69 +212,130 @@ def get_geocode(address: str, city: str = "广州") -> Optional[Dict[str, Any]]:
         'city': city
     }
     
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            async with limiter as sent_at:
+                async with session.get(GEOCODING_URL, params=params,
+                                       timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as response:
+                    if response.status in RETRY_STATUSES and not last_attempt:
+                        limiter.record(sent_at, response.status, response.headers)
+                        reason = f"HTTP {response.status}"
+                    else:
+                        response.raise_for_status()
+                        data = await response.json()
+                        limiter.record(sent_at, response.status, response.headers, data)
+                        if data.get('infocode') not in THROTTLE_INFOCODES or last_attempt:
+                            return data
+                        reason = f"infocode={data.get('infocode')}"
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if last_attempt:
+                raise
+            reason = f"网络错误 {type(e).__name__}"
+        
+        # 被限流或服务暂时不可用，退避后重试
+        delay = min(BACKOFF_FACTOR * (2 ** attempt), MAX_BACKOFF)
+        print(f"    [{address}] {reason}，{delay} 秒后第 {attempt + 1} 次重试")
+        await asyncio.sleep(delay)
+
+async def get_geocode(session: aiohttp.ClientSession, limiter: RateController,
+                      tasks: GeocodeTasks, address: str, city: str = "广州") -> Optional[Dict[str, Any]]:
+    """
+    Get geocoding information from Amap API, at most once per address in a run
+    获取地址的地理编码信息；同一次运行中相同的地址只成功请求一次
+    """
+    key = (normalize_address(address, city), city)
+    
+    # 缓存的是请求任务而不是结果，并发的重复查询会等待同一个请求
+    task = tasks.get(key)
+    if task is None:
+        task = asyncio.ensure_future(request_geocode(session, limiter, address, city))
+        tasks[key] = task
+    else:
+        print(f"    [{address}] 本次运行已查询过，使用同一结果")
+    result = await task
+    
+    # 失败的查询不保留，之后再遇到同一地址时重新请求
+    if result is None and tasks.get(key) is task:
+        del tasks[key]
+    return result
+
+async def request_geocode(session: aiohttp.ClientSession, limiter: RateController,
+                          address: str, city: str) -> Optional[Dict[str, Any]]:
+    """
+    Request and report one geocode from the Amap API
+    请求一次地理编码并输出结果
+    """
     try:
-        response = requests.get(GEOCODING_URL, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = await fetch(session, limiter, address, city)
         
         if data.get('status') == '1' and data.get('geocodes'):
             result = data['geocodes'][0] if data['geocodes'] else None
             if result:
-                print(f"    API返回: {result.get('formatted_address', '')}")
-                print(f"    精确度级别: {result.get('level', '未知')}")
-                print(f"    坐标: {result.get('location', '无坐标')}")
+                print(f"    [{address}] API返回: {result.get('formatted_address', '')}")
+                print(f"    [{address}] 精确度级别: {result.get('level', '未知')}")
+                print(f"    [{address}] 坐标: {result.get('location', '无坐标')}")
             return result
         else:
-            print(f"    地理编码失败: {data.get('info', 'Unknown error')}")
+            print(f"    [{address}] 地理编码失败: {data.get('info', 'Unknown error')}")
             return None
             
     except Exception as e:
-        print(f"    API请求错误: {e}")
+        print(f"    [{address}] API请求错误: {e}")
         return None
-    finally:
-        # 严格遵守3次/秒的API限制：每次调用后等待400毫秒
-        # (1000ms ÷ 3 = 333.33ms，使用400ms更安全)
-        time.sleep(0.4)
 
-def geocode_with_fallback(name: str, address: str, city: str = "广州") -> Optional[Dict[str, Any]]:
+async def geocode_with_fallback(session: aiohttp.ClientSession, limiter: RateController,
+                                tasks: GeocodeTasks, name: str, address: str,
+                                city: str = "广州") -> Optional[Dict[str, Any]]:
     """
     智能地理编码：首先用名称，如果精确度不够则用地址
+    多个幼儿园并发处理，每行输出都带上幼儿园名称以便区分
     """
     print(f"正在处理: {name}")
     
+    # 名称与地址相同时，地址搜索只会得到同样的结果
+    if address and normalize_address(name, city) == normalize_address(address, city):
+        print(f"  [{name}] 名称与地址相同，只搜索一次")
+        return await get_geocode(session, limiter, tasks, name, city)
+    
     # 第一步：尝试用名称获取坐标
-    print(f"  步骤1: 用名称搜索 - {name}")
-    name_result = get_geocode(name, city)
+    print(f"  [{name}] 步骤1: 用名称搜索")
+    name_result = await get_geocode(session, limiter, tasks, name, city)
     
     # 检查名称搜索结果的精确度
     if name_result and name_result.get('level') in PRECISE_LEVELS:
-        print(f"  ✓ 名称搜索成功，精确度足够 (级别: {name_result.get('level')})")
+        print(f"  [{name}] ✓ 名称搜索成功，精确度足够 (级别: {name_result.get('level')})")
         return name_result
     
     # 第二步：如果名称搜索失败或精确度不够，用地址搜索
-    if address:
-        print(f"  步骤2: 用地址搜索 - {address}")
-        address_result = get_geocode(address, city)
+    # 名称搜索已解析到该地址时，地址搜索不会得到更好的结果
+    if address and name_result and \
+            normalize_address(name_result.get('formatted_address', ''), city) == normalize_address(address, city):
+        print(f"  [{name}] 名称搜索已解析到该地址，跳过地址搜索")
+    elif address:
+        print(f"  [{name}] 步骤2: 用地址搜索 - {address}")
+        address_result = await get_geocode(session, limiter, tasks, address, city)
         
         if address_result:
             level = address_result.get('level', '')
-            print(f"  ✓ 地址搜索成功 (级别: {level})")
+            print(f"  [{name}] ✓ 地址搜索成功 (级别: {level})")
             return address_result
         else:
-            print(f"  ✗ 地址搜索也失败")
+            print(f"  [{name}] ✗ 地址搜索也失败")
     else:
-        print(f"  ✗ 名称搜索精确度不够且无地址信息")
+        print(f"  [{name}] ✗ 名称搜索精确度不够且无地址信息")
     
     # 第三步：如果都失败了，检查名称搜索是否有结果（即使精确度不够）
     if name_result:
         level = name_result.get('level', '')
-        print(f"  ⚠ 使用名称搜索结果，但精确度可能不够 (级别: {level})")
+        print(f"  [{name}] ⚠ 使用名称搜索结果，但精确度可能不够 (级别: {level})")
         return name_result
     
-    print(f"  ✗ 完全失败，无法获取坐标")
+    print(f"  [{name}] ✗ 完全失败，无法获取坐标")
     return None
 
-def geocode_kindergartens() -> None:
+async def geocode_kindergartens(session: aiohttp.ClientSession, limiter: RateController,
+                                tasks: GeocodeTasks, cache: GeoCache) -> None:
     """
     为所有幼儿园进行智能地理编码
     """
@@ -146,10 +343,18 @@ def geocode_kindergartens() -> None:
     with open('data/school.json', 'r', encoding='utf-8') as f:
         kindergartens = json.load(f)
     
-    # Load existing geocodes
-    geocodes = load_existing_geocodes()
+    # 同一幼儿园拆分出的多个班型条目按基础名称合并，每个地点只请求一次API
+    groups: Dict[str, List[str]] = {}
+    addresses: Dict[str, str] = {}
+    for kg in kindergartens:
+        name = kg.get('幼儿园名称', '')
+        if not name:
+            continue
+        base = base_name(name)
+        groups.setdefault(base, []).append(name)
+        addresses.setdefault(base, kg.get('幼儿园地址', ''))
     
-    print(f"开始处理 {len(kindergartens)} 个幼儿园...")
+    print(f"开始处理 {len(groups)} 个幼儿园（共 {len(kindergartens)} 条记录）...")
     print("=" * 80)
     
     success_count = 0
@@ -157,47 +362,70 @@ def geocode_kindergartens() -> None:
     failed_count = 0
     improved_count = 0  # 重新获取到更精确坐标的数量
     
-    for i, kg in enumerate(kindergartens):
-        name = kg.get('幼儿园名称', '')
-        address = kg.get('幼儿园地址', '')
+    # 先筛选出需要请求API的幼儿园
+    pending = []
+    for i, (name, entry_names) in enumerate(groups.items()):
+        # 检查是否已有缓存（基础名称或任一拆分条目），以及缓存的精确度
+        existing_data = None
+        for key in [name] + entry_names:
+            existing_data = cache.get(key, "广州")
+            if existing_data:
+                break
         
-        if not name:
-            continue
-            
-        print(f"\n[{i+1}/{len(kindergartens)}] ", end="")
+        # 只按 school.json 中的完整名称保存；清除早期版本写入的基础名称条目
+        if name not in entry_names:
+            cache.delete(name, "广州")
         
-        # 检查是否已有缓存，以及缓存的精确度
-        existing_data = geocodes.get(name)
         if existing_data:
             existing_level = existing_data.get('level', '')
             if existing_level in PRECISE_LEVELS:
                 cache_hit_count += 1
-                print(f"已缓存精确坐标: {name} (级别: {existing_level})")
+                print(f"[{i+1}/{len(groups)}] 已缓存精确坐标: {name} (级别: {existing_level})")
+                # 补齐尚未写入缓存的拆分条目
+                for key in entry_names:
+                    if cache.get(key, "广州") is None:
+                        cache.put(key, existing_data, "广州")
                 continue
             else:
-                print(f"已有坐标但精确度不够，重新获取: {name} (当前级别: {existing_level})")
+                print(f"[{i+1}/{len(groups)}] 已有坐标但精确度不够，重新获取: {name} (当前级别: {existing_level})")
         
-        # 进行智能地理编码
-        geocode_result = geocode_with_fallback(name, address, "广州")
+        pending.append((name, addresses[name], existing_data))
+    
+    print(f"\n需要请求API的幼儿园: {len(pending)} 个")
+    
+    # 最多 MAX_WORKERS 个幼儿园同时进行智能地理编码，按完成顺序处理结果
+    semaphore = asyncio.Semaphore(MAX_WORKERS)
+    
+    async def worker(name: str, address: str, existing_data: Optional[Dict[str, Any]]):
+        async with semaphore:
+            result = await geocode_with_fallback(session, limiter, tasks, name, address, "广州")
+        return name, existing_data, result
+    
+    workers = [asyncio.create_task(worker(*item)) for item in pending]
+    
+    for done, task in enumerate(asyncio.as_completed(workers), 1):
+        name, existing_data, geocode_result = await task
         
         if geocode_result:
-            geocodes[name] = geocode_result
+            # 同一地点的所有拆分条目共用结果，geo.json 中按完整名称查找
+            for key in groups[name]:
+                cache.put(key, geocode_result, "广州")
             if existing_data:
                 improved_count += 1
-                print(f"  ✓ 坐标已改进")
+                print(f"  ✓ 坐标已改进: {name}")
             else:
                 success_count += 1
-                print(f"  ✓ 新获取坐标")
+                print(f"  ✓ 新获取坐标: {name}")
         else:
             failed_count += 1
-            print(f"  ✗ 获取坐标失败")
-        
-        # API频率控制已在get_geocode函数中处理
+            print(f"  ✗ 获取坐标失败: {name}")
         
-        # 定期保存进度
-        if (i + 1) % 50 == 0:
-            save_geocodes(geocodes)
-            print(f"\n>>> 进度保存 - {i+1}/{len(kindergartens)} 已处理")
+        # 定期提交有变化的记录
+        if done % SAVE_INTERVAL == 0:
+            cache.commit()
+            print(f"\n>>> 进度保存 - {done}/{len(pending)} 已处理")
+    
+    cache.commit()
     
     print("\n" + "=" * 80)
     print("幼儿园地理编码完成！")
@@ -206,58 +434,52 @@ def geocode_kindergartens() -> None:
     print(f"缓存命中: {cache_hit_count}")
     print(f"获取失败: {failed_count}")
     print(f"总计处理: {success_count + improved_count + cache_hit_count}")
-    
-    # 保存最终结果
-    save_geocodes(geocodes)
 
-def geocode_home_addresses() -> None:
+async def geocode_home_addresses(session: aiohttp.ClientSession, limiter: RateController,
+                                 tasks: GeocodeTasks, cache: GeoCache) -> None:
     """
     为家庭住址进行地理编码
     """
-    geocodes = load_existing_geocodes()
-    
     print(f"开始处理 {len(HOME_ADDRESSES)} 个家庭住址...")
     print("=" * 50)
     
+    pending = []
     for address in HOME_ADDRESSES:
-        print(f"\n正在处理家庭住址: {address}")
-        
         # 检查缓存
-        if address in geocodes:
-            existing_level = geocodes[address].get('level', '')
+        existing_data = cache.get(address, "广州")
+        if existing_data:
+            existing_level = existing_data.get('level', '')
             print(f"已缓存: {address} (级别: {existing_level})")
             continue
-        
-        # 家庭住址直接用地址搜索
-        geocode_result = get_geocode(address, "广州")
-        
+        pending.append(address)
+    
+    # 家庭住址直接用地址搜索
+    results = await asyncio.gather(*(
+        get_geocode(session, limiter, tasks, address, "广州") for address in pending
+    ))
+    
+    for address, geocode_result in zip(pending, results):
         if geocode_result:
-            geocodes[address] = geocode_result
-            print(f"✓ 获取成功")
+            cache.put(address, geocode_result, "广州")
+            print(f"✓ 获取成功: {address}")
         else:
-            print(f"✗ 获取失败")
-        
-        # API频率控制已在get_geocode函数中处理
+            print(f"✗ 获取失败: {address}")
     
     print("\n家庭住址地理编码完成！")
-    save_geocodes(geocodes)
+    cache.commit()
 
 def check_precision_summary():
     """检查并总结坐标精确度"""
     geocodes = load_existing_geocodes()
     
-    level_stats = {}
+    level_stats = Counter(data.get('level', '未知') for data in geocodes.values())
     total = len(geocodes)
     
-    for key, data in geocodes.items():
-        level = data.get('level', '未知')
-        level_stats[level] = level_stats.get(level, 0) + 1
-    
     print("\n" + "=" * 50)
     print("坐标精确度统计:")
     print("=" * 50)
     
-    for level, count in sorted(level_stats.items(), key=lambda x: x[1], reverse=True):
+    for level, count in level_stats.most_common():
         percentage = (count / total) * 100
         status = "✓ 精确" if level in PRECISE_LEVELS else "⚠ 可能不精确"
         print(f"{level:15} {count:3}个 ({percentage:5.1f}%) {status}")
@@ -270,32 +492,55 @@ def check_precision_summary():
     print(f"精确坐标: {precise_count}个 ({precise_percentage:.1f}%)")
     print(f"可能不精确: {total - precise_count}个 ({100 - precise_percentage:.1f}%)")
 
+async def run_geocoding() -> None:
+    """依次处理家庭住址和幼儿园，整个运行共享一个连接池、限流器、请求记录和缓存"""
+    limiter = RateController(RATE_LIMIT, RATE_PERIOD)
+    tasks: GeocodeTasks = {}
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONNECTIONS,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL
+    )
+    
+    cache = GeoCache()
+    
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            # 先处理家庭住址
+            print("\n" + "="*50)
+            print("第一步: 处理家庭住址")
+            print("="*50)
+            await geocode_home_addresses(session, limiter, tasks, cache)
+            
+            # 再处理幼儿园
+            print("\n" + "="*50)
+            print("第二步: 处理幼儿园")
+            print("="*50)
+            await geocode_kindergartens(session, limiter, tasks, cache)
+        
+        # 导出 geo.json 供前端使用，并记录缓存已与之同步
+        save_geocodes(cache.to_dict())
+        cache.mark_synced(GEO_JSON_PATH)
+    finally:
+        cache.close()
+    
+    print(f"\nAPI请求次数: {limiter.request_count}，触发限流: {limiter.throttle_count} 次")
+
 def main():
     """Main function"""
     print("开始智能地理编码处理...")
     print(f"API Key: {API_KEY[:10]}...")
-    print(f"精确度要求: {', '.join(PRECISE_LEVELS)}")
-    print("API频率控制: 严格遵守3次/秒限制，每次调用后等待400毫秒")
-    print("预计处理时间: 由于API限制，处理速度较慢但更稳定")
+    print(f"精确度要求: {', '.join(sorted(PRECISE_LEVELS))}")
+    print(f"API频率控制: 不超过{RATE_LIMIT}次/秒，遇到限流自动降低请求频率")
     
-    # 先处理家庭住址
-    print("\n" + "="*50)
-    print("第一步: 处理家庭住址")
-    print("="*50)
-    geocode_home_addresses()
-    
-    # 再处理幼儿园
-    print("\n" + "="*50)
-    print("第二步: 处理幼儿园")
-    print("="*50)
-    geocode_kindergartens()
+    asyncio.run(run_geocoding())
     
     # 最后生成精确度报告
     check_precision_summary()
     
     print("\n" + "="*50)
     print("所有地理编码处理完成！")
-    print("数据已保存到 data/geo.json")
+    print(f"数据已保存到 {GEO_JSON_PATH}")
     print("="*50)
 
 if __name__ == "__main__":
@@ -6,25 +6,65 @@ Data parsing script for kindergarten information
 """
 
 import csv
+import hashlib
 import json
 import os
 import sys
-from typing import List, Dict, Any
+from operator import itemgetter
+from typing import List, Dict, Any, Iterator, Optional
 import re
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Compiled once at import time; these run for every row
+_NUM_RE = re.compile(r'(\d+(?:\.\d+)?)')
+# Class names followed by fees, e.g. "成长班2500国际班4000" or "普通班：2800国际班：4800"
+_CLASS_FEE_RE = re.compile(r'([\u4e00-\u9fff]+班)[:：]?(\d+(?:\.\d+)?)')
+# Phone numbers in the PDF text fallback
+_PHONE_RE_1 = re.compile(r'^\d{3,4}-?\d{8}$')
+_PHONE_RE_2 = re.compile(r'^020-\d{8}$')
+_DIGITS_RE = re.compile(r'^\d+$')
+
+# CSV columns used for each kindergarten: 名称, 办园性质, 规模, 地址, 保教费, 电话.
+# The 是否普惠 column (4) is not read; it is derived from 办园性质 instead.
+_CSV_COLUMNS = itemgetter(1, 3, 5, 6, 8, 9)
+
+# Header keywords locating the columns read from each PDF table, in unpacking order.
+# Header cells wrap across lines, e.g. "核定总\n班数\n(个)", so whitespace is ignored.
+_PDF_HEADER_KEYWORDS = {
+    "name": "园所名称",
+    "office_nature": "办园性质",
+    "address": "地址",
+    "phone": "联系电话",
+    "scale": "核定总班数",
+    "fee": "保教费",
+}
+# Column positions of the current PDF layout, used until a header row is found:
+# 序号, 镇街, 园所名称, 是否镇街中心园, 办园性质, 地址, 招生联系电话, 核定总班数, 小班班数, 小班人数, 保教费, 备注
+_PDF_DEFAULT_COLUMNS = {"name": 2, "office_nature": 4, "address": 5, "phone": 6, "scale": 7, "fee": 10}
+
+# Arguments for page.extract_tables() and the layout of the cache built from them;
+# both are part of the cache key, so changing either invalidates cached tables
+_PDF_TABLE_SETTINGS: Dict[str, Any] = {}
+_PDF_CACHE_VERSION = 1
+
+# Translation tables that remove or replace formatting characters in a single pass
+_WS_TABLE = str.maketrans({'\n': '', '\r': '', '\t': ' '})
+_CURRENCY_TABLE = str.maketrans('', '', '¥￥,')
+_FEE_STRIP_TABLE = str.maketrans('', '', '¥￥,元/月生')
+
 
 def clean_text(text: str) -> str:
     """Clean text by removing newlines, tabs, and extra whitespace"""
     if not text or text == "None":
         return ""
     
-    # Remove newlines, carriage returns, and tabs
-    text = text.replace('\n', '').replace('\r', '').replace('\t', ' ')
-    
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    
-    return text.strip()
+    # Remove newlines and carriage returns, turn tabs into spaces, then
+    # collapse extra whitespace; split() also drops leading/trailing spaces
+    return ' '.join(text.translate(_WS_TABLE).split())
 
 
 def extract_pure_number(text: str) -> str:
@@ -33,10 +73,10 @@ def extract_pure_number(text: str) -> str:
         return ""
     
     # Remove currency symbols, commas, and other formatting
-    cleaned = text.replace('¥', '').replace('￥', '').replace(',', '').replace('元', '').replace('/', '').replace('月', '').replace('生', '')
+    cleaned = text.translate(_FEE_STRIP_TABLE)
     
     # Extract number using regex
-    match = re.search(r'(\d+(?:\.\d+)?)', cleaned)
+    match = _NUM_RE.search(cleaned)
     if match:
         return match.group(1)
     
@@ -58,14 +98,12 @@ def parse_multi_class_fee(fee_text: str) -> List[Dict[str, str]]:
     if not fee_text:
         return [{"class": "", "fee": ""}]
     
-    # Clean the fee text by removing currency symbols and unnecessary chars
-    cleaned_text = fee_text.replace('¥', '').replace('￥', '').replace(',', '')
+    # Clean the fee text by removing currency symbols and commas only;
+    # unit characters such as 生 may be part of a class name
+    cleaned_text = fee_text.translate(_CURRENCY_TABLE)
     
-    # Pattern to match class names followed by fees
-    # Supports formats like "成长班2500国际班4000" or "普通班：2800国际班：4800"
-    # Updated pattern to be more precise and handle Chinese characters
-    pattern = r'([\u4e00-\u9fff]+班)[:：]?(\d+(?:\.\d+)?)'
-    matches = re.findall(pattern, cleaned_text)
+    # Match class names followed by fees
+    matches = _CLASS_FEE_RE.findall(cleaned_text)
     
     if len(matches) > 1:
         # Multiple classes found
@@ -121,39 +159,27 @@ except ImportError:
         sys.exit(1)
 
 
-def parse_csv_file(csv_path: str) -> List[Dict[str, Any]]:
-    """Parse CSV file and extract kindergarten data"""
-    kindergartens = []
-    
-    with open(csv_path, 'r', encoding='utf-8') as file:
-        # Skip the first two header lines
-        lines = file.readlines()[2:]
+def parse_csv_file(csv_path: str) -> Iterator[Dict[str, Any]]:
+    """Parse CSV file and yield kindergarten data"""
+    with open(csv_path, 'r', encoding='utf-8', newline='') as file:
+        # Stream rows straight from the file instead of reading it into memory
+        csv_reader = csv.reader(file)
         
-        # Create CSV reader from the remaining lines
-        csv_reader = csv.reader(lines)
+        # Skip the title record (a quoted cell spanning the first two lines)
+        next(csv_reader, None)
         
         for row in csv_reader:
             # Skip empty rows, rows with insufficient data, or header row
-            if len(row) < 10 or not row[1].strip() or row[1] == "幼儿园名称":
+            # before doing any cleaning work on them
+            if len(row) < 10 or row[1] == "幼儿园名称" or not row[1].strip():
                 continue
                 
             # Extract data from CSV row and clean text
-            name = clean_text(row[1])
-            office_nature = clean_text(row[3])
-            is_inclusive = clean_text(row[4])
-            scale = clean_text(row[5])
-            address = clean_text(row[6])
-            fee = clean_text(row[8])
-            phone = clean_text(row[9])
+            name, office_nature, scale, address, fee, phone = map(clean_text, _CSV_COLUMNS(row))
             
-            # Apply business logic for "是否普惠"
-            if "民办" in office_nature:
-                if "普惠性民办园" in office_nature:
-                    is_inclusive_final = "是"
-                else:
-                    is_inclusive_final = "否"
-            else:
-                is_inclusive_final = "是"
+            # Apply business logic for "是否普惠": only private kindergartens
+            # not registered as 普惠性民办园 are non-inclusive
+            is_inclusive_final = "否" if "民办" in office_nature and "普惠性民办园" not in office_nature else "是"
             
             # Create base kindergarten data
             base_data = {
@@ -171,150 +197,249 @@ def parse_csv_file(csv_path: str) -> List[Dict[str, Any]]:
             
             # Create entries (one for each class if multiple classes exist)
             entries = create_kindergarten_entries(base_data, fee_classes)
-            kindergartens.extend(entries)
+            yield from entries
+
+
+def extract_pdf_pages(pdf_path: str) -> List[Dict[str, Any]]:
+    """
+    Extract the tables of every PDF page, or its text when a page has no tables.
+    
+    Layout analysis is by far the slowest step of parsing, so the result is cached
+    next to the PDF and reused until the file or the pdfplumber version changes.
+    
+    Returns:
+        List of {"tables": [...], "text": "..."} dictionaries, one per page
+    """
+    import pdfplumber
+    
+    with open(pdf_path, 'rb') as f:
+        cache_key = ":".join([
+            hashlib.sha256(f.read()).hexdigest(),
+            pdfplumber.__version__,
+            str(_PDF_CACHE_VERSION),
+            json.dumps(_PDF_TABLE_SETTINGS, sort_keys=True),
+        ])
+    cache_path = pdf_path + ".tables.json"
+    
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get("key") == cache_key:
+                return cached["pages"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+    
+    pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            tables = page.extract_tables(_PDF_TABLE_SETTINGS)
+            # Text is only needed for the fallback on pages without tables
+            text = "" if tables else (page.extract_text() or "")
+            pages.append({"tables": tables, "text": text})
+            # Drop the page's parsed layout objects once they have been used
+            page.flush_cache()
+    
+    # The cache is only an optimization: failing to write it must not lose the extracted pages
+    temp_path = cache_path + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"key": cache_key, "pages": pages}, f, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not write PDF table cache {cache_path}: {e}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    
+    return pages
+
+
+def pdf_header_columns(row: List[Optional[str]]) -> Optional[Dict[str, int]]:
+    """
+    Map the fields read from a PDF table to column indexes using its header row.
+    
+    Returns:
+        Dictionary of field name to column index, or None if the row is not a header
+    """
+    headers = [''.join(cell.split()) if cell else "" for cell in row]
+    columns = {}
     
-    return kindergartens
+    for field, keyword in _PDF_HEADER_KEYWORDS.items():
+        for index, header in enumerate(headers):
+            if keyword in header:
+                columns[field] = index
+                break
+        else:
+            return None
+    
+    return columns
 
 
-def parse_pdf_file(pdf_path: str) -> List[Dict[str, Any]]:
-    """Parse PDF file and extract kindergarten data"""
-    kindergartens = []
+def parse_pdf_file(pdf_path: str) -> Iterator[Dict[str, Any]]:
+    """Parse PDF file and yield kindergarten data"""
+    # Tables continuing on a new page without a header reuse the previous layout
+    columns = _PDF_DEFAULT_COLUMNS
     
     try:
-        import pdfplumber
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                # Try to extract table data
-                tables = page.extract_tables()
-                
-                if tables:
-                    for table in tables:
-                        for row in table:
-                            if not row or len(row) < 6:
-                                continue
-                            
-                            # Skip header rows
-                            if any(header in str(row) for header in ['序号', '镇街', '园所名称', '办园性质']):
-                                continue
-                            
-                            try:
-                                # Extract data based on PDF table structure
-                                # Expected columns: 序号, 镇街, 园所名称, 是否镇街中心园, 办园性质, 地址, 招生联系电话, 班数, 小班人数, 保教费
-                                if len(row) >= 10:
-                                    name = clean_text(str(row[2]) if row[2] else "")
-                                    office_nature = clean_text(str(row[4]) if row[4] else "")
-                                    address = clean_text(str(row[5]) if row[5] else "")
-                                    phone = clean_text(str(row[6]) if row[6] else "")
-                                    scale = clean_text(str(row[7]) if row[7] else "")
-                                    fee = clean_text(str(row[10]) if row[10] else "")
-                                    
-                                    # Skip if essential data is missing
-                                    if not name or name == "None" or "幼儿园" not in name:
-                                        continue
-                                    
-                                    # Determine 是否普惠 based on 办园性质
-                                    if "民办" in office_nature:
-                                        if "普惠" in office_nature or "民办普惠" in office_nature:
-                                            is_inclusive = "是"
-                                        else:
-                                            is_inclusive = "否"
-                                    else:
-                                        is_inclusive = "是"  # 公办默认为普惠
-                                    
-                                    # Create base kindergarten data
-                                    base_data = {
-                                        "幼儿园名称": name,
-                                        "办园性质": office_nature,
-                                        "是否普惠": is_inclusive,
-                                        "规模（班）": scale,
-                                        "幼儿园地址": address,
-                                        "保教费收费标准（元/月/生）": fee,
-                                        "幼儿园联系电话": phone
-                                    }
-                                    
-                                    # Parse fee for multiple classes
-                                    fee_classes = parse_multi_class_fee(fee)
-                                    
-                                    # Create entries (one for each class if multiple classes exist)
-                                    entries = create_kindergarten_entries(base_data, fee_classes)
-                                    kindergartens.extend(entries)
-                            except Exception as e:
-                                continue
-                
-                # Fallback: try text extraction if table extraction fails
-                if not tables:
-                    text = page.extract_text() or ""
-                    lines = text.split('\n')
+        for page in extract_pdf_pages(pdf_path):
+            tables = page["tables"]
+            
+            if tables:
+                for table in tables:
+                    # Index the header row once per table instead of scanning every row for header text
+                    header_columns = pdf_header_columns(table[0]) if table and table[0] else None
+                    if header_columns:
+                        columns = header_columns
+                        table = table[1:]
+                    row_cells = itemgetter(*(columns[field] for field in _PDF_HEADER_KEYWORDS))
+                    last_column = max(columns.values())
                     
-                    for line in lines:
-                        line = line.strip()
-                        if not line or "幼儿园" not in line:
+                    for row in table:
+                        if not row or len(row) < 6:
                             continue
                         
-                        # Try to parse structured text lines
-                        # Look for patterns like: "序号 镇街 幼儿园名称 ... 信息"
-                        parts = line.split()
-                        if len(parts) >= 6:
-                            for i, part in enumerate(parts):
-                                if "幼儿园" in part:
-                                    name = clean_text(part)
-                                    
-                                    # Try to extract other info from surrounding parts
-                                    office_nature = ""
-                                    address = ""
-                                    phone = ""
-                                    scale = ""
-                                    fee = ""
-                                    
-                                    # Simple heuristic extraction
-                                    for j in range(i+1, min(i+6, len(parts))):
-                                        part_str = clean_text(parts[j])
-                                        if "公办" in part_str or "民办" in part_str:
-                                            office_nature = part_str
-                                        elif re.match(r'^\d{3,4}-?\d{8}$', part_str) or re.match(r'^020-\d{8}$', part_str):
-                                            phone = part_str
-                                        elif re.match(r'^\d+$', part_str) and len(part_str) <= 3:
-                                            if not scale:
-                                                scale = part_str
-                                            elif not fee:
-                                                fee = part_str
-                                        elif "广州" in part_str:
-                                            address = part_str
-                                    
-                                    # Determine 是否普惠
-                                    if "民办" in office_nature:
-                                        if "普惠" in office_nature:
-                                            is_inclusive = "是"
-                                        else:
-                                            is_inclusive = "否"
+                        try:
+                            # Extract data based on the PDF table header
+                            if len(row) > last_column:
+                                name, office_nature, address, phone, scale, fee = (
+                                    clean_text(str(cell) if cell else "") for cell in row_cells(row)
+                                )
+                                
+                                # Skip if essential data is missing
+                                if not name or name == "None" or "幼儿园" not in name:
+                                    continue
+                                
+                                # Determine 是否普惠 based on 办园性质
+                                if "民办" in office_nature:
+                                    if "普惠" in office_nature or "民办普惠" in office_nature:
+                                        is_inclusive = "是"
                                     else:
+                                        is_inclusive = "否"
+                                else:
+                                    is_inclusive = "是"  # 公办默认为普惠
+                                
+                                # Create base kindergarten data
+                                base_data = {
+                                    "幼儿园名称": name,
+                                    "办园性质": office_nature,
+                                    "是否普惠": is_inclusive,
+                                    "规模（班）": scale,
+                                    "幼儿园地址": address,
+                                    "保教费收费标准（元/月/生）": fee,
+                                    "幼儿园联系电话": phone
+                                }
+                                
+                                # Parse fee for multiple classes
+                                fee_classes = parse_multi_class_fee(fee)
+                                
+                                # Create entries (one for each class if multiple classes exist)
+                                entries = create_kindergarten_entries(base_data, fee_classes)
+                                yield from entries
+                        except Exception as e:
+                            continue
+            
+            # Fallback: try text extraction if table extraction fails
+            if not tables:
+                text = page["text"]
+                lines = text.split('\n')
+                
+                for line in lines:
+                    line = line.strip()
+                    if not line or "幼儿园" not in line:
+                        continue
+                    
+                    # Try to parse structured text lines
+                    # Look for patterns like: "序号 镇街 幼儿园名称 ... 信息"
+                    parts = line.split()
+                    if len(parts) >= 6:
+                        for i, part in enumerate(parts):
+                            if "幼儿园" in part:
+                                name = clean_text(part)
+                                
+                                # Try to extract other info from surrounding parts
+                                office_nature = ""
+                                address = ""
+                                phone = ""
+                                scale = ""
+                                fee = ""
+                                
+                                # Simple heuristic extraction
+                                for j in range(i+1, min(i+6, len(parts))):
+                                    part_str = clean_text(parts[j])
+                                    if "公办" in part_str or "民办" in part_str:
+                                        office_nature = part_str
+                                    elif _PHONE_RE_1.match(part_str) or _PHONE_RE_2.match(part_str):
+                                        phone = part_str
+                                    elif _DIGITS_RE.match(part_str) and len(part_str) <= 3:
+                                        if not scale:
+                                            scale = part_str
+                                        elif not fee:
+                                            fee = part_str
+                                    elif "广州" in part_str:
+                                        address = part_str
+                                
+                                # Determine 是否普惠
+                                if "民办" in office_nature:
+                                    if "普惠" in office_nature:
                                         is_inclusive = "是"
-                                    
-                                    # Create base kindergarten data
-                                    base_data = {
-                                        "幼儿园名称": name,
-                                        "办园性质": office_nature,
-                                        "是否普惠": is_inclusive,
-                                        "规模（班）": scale,
-                                        "幼儿园地址": address,
-                                        "保教费收费标准（元/月/生）": fee,
-                                        "幼儿园联系电话": phone
-                                    }
-                                    
-                                    # Parse fee for multiple classes
-                                    fee_classes = parse_multi_class_fee(fee)
-                                    
-                                    # Create entries (one for each class if multiple classes exist)
-                                    entries = create_kindergarten_entries(base_data, fee_classes)
-                                    kindergartens.extend(entries)
-                                    break
+                                    else:
+                                        is_inclusive = "否"
+                                else:
+                                    is_inclusive = "是"
+                                
+                                # Create base kindergarten data
+                                base_data = {
+                                    "幼儿园名称": name,
+                                    "办园性质": office_nature,
+                                    "是否普惠": is_inclusive,
+                                    "规模（班）": scale,
+                                    "幼儿园地址": address,
+                                    "保教费收费标准（元/月/生）": fee,
+                                    "幼儿园联系电话": phone
+                                }
+                                
+                                # Parse fee for multiple classes
+                                fee_classes = parse_multi_class_fee(fee)
+                                
+                                # Create entries (one for each class if multiple classes exist)
+                                entries = create_kindergarten_entries(base_data, fee_classes)
+                                yield from entries
+                                break
     
     except Exception as e:
         print(f"Error parsing PDF file: {e}")
         print("Note: PDF parsing may require adjustments based on the actual file structure")
+
+
+def to_json_bytes(data: Any, indent: bool = False) -> bytes:
+    """Serialize data to UTF-8 JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_json_array(jsonl_path: str, output_path: str) -> None:
+    """
+    Convert a JSON-Lines file into an indented JSON array, one entry at a time.
     
-    return kindergartens
+    The output is identical to json.dump(entries, ensure_ascii=False, indent=2)
+    without holding all entries in memory.
+    """
+    with open(jsonl_path, 'rb') as src, open(output_path, 'wb') as dst:
+        dst.write(b'[')
+        count = 0
+        for line in src:
+            if not line.strip():
+                continue
+            entry = to_json_bytes(json.loads(line), indent=True)
+            dst.write(b',\n  ' if count else b'\n  ')
+            dst.write(entry.replace(b'\n', b'\n  '))
+            count += 1
+        dst.write(b'\n]' if count else b']')
 
 
 def main():
@@ -322,6 +447,7 @@ def main():
     # Define file paths
     csv_path = "data/raw/hp.csv"
     pdf_path = "data/raw/zc.pdf"
+    jsonl_path = "data/school.jsonl"
     output_path = "data/school.json"
     
     # Check if input files exist
@@ -336,25 +462,23 @@ def main():
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
-    # Parse CSV file
-    print("Parsing CSV file...")
-    csv_data = parse_csv_file(csv_path)
-    print(f"Found {len(csv_data)} kindergartens in CSV file")
-    
-    # Parse PDF file
-    print("Parsing PDF file...")
-    pdf_data = parse_pdf_file(pdf_path)
-    print(f"Found {len(pdf_data)} kindergartens in PDF file")
-    
-    # Combine data
-    all_data = csv_data + pdf_data
+    # Parse both files, writing each entry to JSON Lines as soon as it is parsed
+    total = 0
+    with open(jsonl_path, 'wb') as f:
+        for label, path, parse in (("CSV", csv_path, parse_csv_file), ("PDF", pdf_path, parse_pdf_file)):
+            print(f"Parsing {label} file...")
+            count = 0
+            for entry in parse(path):
+                f.write(to_json_bytes(entry) + b'\n')
+                count += 1
+            print(f"Found {count} kindergartens in {label} file")
+            total += count
     
-    # Save to JSON file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=2)
+    # Save to JSON file for the web page and get_geo.py
+    write_json_array(jsonl_path, output_path)
     
     print(f"Data successfully saved to {output_path}")
-    print(f"Total kindergartens: {len(all_data)}")
+    print(f"Total kindergartens: {total}")
 
 
 if __name__ == "__main__":